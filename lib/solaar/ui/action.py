@@ -15,7 +15,11 @@
 ## with this program; if not, write to the Free Software Foundation, Inc.,
 ## 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 import logging
+import mmap
+import os
 import traceback
+
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 
 import yaml
@@ -23,15 +27,53 @@ from gi.repository import Gdk
 from gi.repository import GLib
 from gi.repository import Gtk
 
+from logitech_receiver.common import NamedInt
+from logitech_receiver.hidpp20 import Button
+from logitech_receiver.hidpp20 import LEDEffectSetting
+from logitech_receiver.hidpp20 import OnboardProfile
 from logitech_receiver.hidpp20 import OnboardProfiles
 from logitech_receiver.hidpp20 import OnboardProfilesVersion
+from solaar.configuration import named_int_representer
 from solaar.i18n import _
 from solaar.ui import common
 
 from . import pair_window
 
+try:  # use the libyaml bindings when available, they are much faster for large profile files
+    from yaml import CSafeDumper as _SafeDumper
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeDumper as _SafeDumper
+    from yaml import SafeLoader as _SafeLoader
+
 logger = logging.getLogger(__name__)
 
+_MMAP_MIN_SIZE = 64 * 1024  # smaller profile files are cheaper to read than to map
+
+# profile files are parsed and serialized here so that large files hold up neither GTK nor the AsyncUI task runner
+_profiles_io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ProfilesIO")
+
+
+class _Loader(_SafeLoader):
+    """Loader for profile files, keeps the profile tags out of the shared yaml loaders"""
+
+
+class _Dumper(_SafeDumper):
+    """Dumper for profile files, keeps the profile representers out of the shared yaml dumpers"""
+
+
+# the profile classes only register their tags with the pure-Python loader and dumper
+_Loader.add_constructor("!NamedInt", NamedInt.from_yaml)
+_Dumper.add_representer(NamedInt, named_int_representer)  # written as plain ints, like the rest of Solaar does
+for _tag, _cls in (
+    ("!LEDEffectSetting", LEDEffectSetting),
+    ("!Button", Button),
+    ("!OnboardProfile", OnboardProfile),
+    ("!OnboardProfiles", OnboardProfiles),
+):
+    _Loader.add_constructor(_tag, _cls.from_yaml)
+    _Dumper.add_representer(_cls, _cls.to_yaml)
+
 
 class GtkSignal(Enum):
     ACTIVATE = "activate"
@@ -121,6 +163,104 @@ def _show_message(window, title, text, message_type):
     dialog.destroy()
 
 
+_filters = None
+
+
+def _yaml_filters():
+    """Create the file chooser filters for profile files once and reuse them"""
+    global _filters
+    if _filters is None:
+        filter_yaml = Gtk.FileFilter()
+        filter_yaml.set_name(_("YAML files"))
+        filter_yaml.add_pattern("*.yaml")
+        filter_all = Gtk.FileFilter()
+        filter_all.set_name(_("All files"))
+        filter_all.add_pattern("*")
+        _filters = (filter_yaml, filter_all)
+    return _filters
+
+
+# _node_events and _represent stand in for PyYAML's Serializer.serialize and Representer.represent so that
+# each profile can be emitted as soon as it is represented.  They rely on PyYAML internals (the resolver
+# arguments and the represented_objects and object_keeper attributes), and they do not emit anchors or
+# aliases, so an object that appears twice within a profile is written out in full both times.
+def _node_events(dumper, node):
+    """Generate the YAML events for a representation node"""
+    if isinstance(node, yaml.ScalarNode):
+        implicit = (
+            node.tag == dumper.resolve(yaml.ScalarNode, node.value, (True, False)),
+            node.tag == dumper.resolve(yaml.ScalarNode, node.value, (False, True)),
+        )
+        yield yaml.ScalarEvent(None, node.tag, implicit, node.value, style=node.style)
+    elif isinstance(node, yaml.SequenceNode):
+        implicit = node.tag == dumper.resolve(yaml.SequenceNode, node.value, True)
+        yield yaml.SequenceStartEvent(None, node.tag, implicit, flow_style=node.flow_style)
+        for item in node.value:
+            yield from _node_events(dumper, item)
+        yield yaml.SequenceEndEvent()
+    else:
+        implicit = node.tag == dumper.resolve(yaml.MappingNode, node.value, True)
+        yield yaml.MappingStartEvent(None, node.tag, implicit, flow_style=node.flow_style)
+        for key, value in node.value:
+            yield from _node_events(dumper, key)
+            yield from _node_events(dumper, value)
+        yield yaml.MappingEndEvent()
+
+
+def _represent(dumper, data):
+    node = dumper.represent_data(data)
+    dumper.represented_objects = {}  # don't keep earlier profiles alive
+    dumper.object_keeper = []
+    return node
+
+
+def _profiles_events(dumper, profiles):
+    """Generate the YAML events for onboard profiles, representing one profile at a time"""
+    yield yaml.StreamStartEvent()
+    yield yaml.DocumentStartEvent()
+    yield yaml.MappingStartEvent(None, "!OnboardProfiles", False, flow_style=False)
+    for key, value in sorted(profiles.__dict__.items()):
+        yield from _node_events(dumper, _represent(dumper, key))
+        if key == "profiles":
+            yield yaml.MappingStartEvent(None, None, True, flow_style=False)
+            for number, profile in sorted(value.items()):
+                yield from _node_events(dumper, _represent(dumper, number))
+                yield from _node_events(dumper, _represent(dumper, profile))
+            yield yaml.MappingEndEvent()
+        else:
+            yield from _node_events(dumper, _represent(dumper, value))
+    yield yaml.MappingEndEvent()
+    yield yaml.DocumentEndEvent()
+    yield yaml.StreamEndEvent()
+
+
+def _write_profiles(profiles, filename):
+    """Write a profiles file one profile at a time, only replacing filename once it is complete"""
+    partial = filename + ".part"
+    try:
+        with open(partial, "w") as f:
+            dumper = _Dumper(f)
+            try:
+                for event in _profiles_events(dumper, profiles):
+                    dumper.emit(event)
+            finally:
+                dumper.dispose()
+        os.replace(partial, filename)
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+
+
+def _read_profiles(filename):
+    """Load a profiles file, mapping large files into memory instead of reading them"""
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size < _MMAP_MIN_SIZE:
+            return yaml.load(f, Loader=_Loader)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return yaml.load(mm, Loader=_Loader)
+
+
 def export_profiles(window, device):
     """Export device onboard profiles to YAML file"""
     assert device
@@ -144,17 +284,8 @@ def export_profiles(window, device):
     default_name = f"{device.name.replace(' ', '_')}_profiles.yaml"
     dialog.set_current_name(default_name)
 
-    # Add YAML filter
-    filter_yaml = Gtk.FileFilter()
-    filter_yaml.set_name(_("YAML files"))
-    filter_yaml.add_pattern("*.yaml")
-    dialog.add_filter(filter_yaml)
-
-    # Add all files filter
-    filter_all = Gtk.FileFilter()
-    filter_all.set_name(_("All files"))
-    filter_all.add_pattern("*")
-    dialog.add_filter(filter_all)
+    for file_filter in _yaml_filters():
+        dialog.add_filter(file_filter)
 
     response = dialog.run()
     filename = dialog.get_filename()
@@ -162,11 +293,9 @@ def export_profiles(window, device):
 
     if response == Gtk.ResponseType.OK and filename:
 
-        def _do_export():
+        def _export_done(future):
             try:
-                with open(filename, "w") as f:
-                    yaml.dump(device.profiles, f)
-
+                future.result()
                 GLib.idle_add(
                     _show_message,
                     window,
@@ -180,7 +309,7 @@ def export_profiles(window, device):
                     _show_message, window, _("Export Failed"), _("Failed to export profiles:\n%s") % str(e), Gtk.MessageType.ERROR
                 )
 
-        common.ui_async(_do_export)
+        _profiles_io.submit(_write_profiles, device.profiles, filename).add_done_callback(_export_done)
 
 
 def import_profiles(window, device):
@@ -202,17 +331,8 @@ def import_profiles(window, device):
     dialog = Gtk.FileChooserDialog(title=_("Import Profiles"), parent=window, action=Gtk.FileChooserAction.OPEN)
     dialog.add_buttons(Gtk.STOCK_CANCEL, Gtk.ResponseType.CANCEL, Gtk.STOCK_OPEN, Gtk.ResponseType.OK)
 
-    # Add YAML filter
-    filter_yaml = Gtk.FileFilter()
-    filter_yaml.set_name(_("YAML files"))
-    filter_yaml.add_pattern("*.yaml")
-    dialog.add_filter(filter_yaml)
-
-    # Add all files filter
-    filter_all = Gtk.FileFilter()
-    filter_all.set_name(_("All files"))
-    filter_all.add_pattern("*")
-    dialog.add_filter(filter_all)
+    for file_filter in _yaml_filters():
+        dialog.add_filter(file_filter)
 
     response = dialog.run()
     filename = dialog.get_filename()
@@ -220,27 +340,33 @@ def import_profiles(window, device):
 
     if response == Gtk.ResponseType.OK and filename:
 
+        def _import_failed(e):
+            logger.error("Error importing profiles: %s", traceback.format_exc())
+            GLib.idle_add(
+                _show_message, window, _("Import Failed"), _("Failed to import profiles:\n%s") % str(e), Gtk.MessageType.ERROR
+            )
+
         def _do_import():
-            try:
-                # Read and validate profiles file
-                with open(filename, "r") as f:
-                    profiles = yaml.safe_load(f)
+            # Read and validate profiles file
+            profiles = _read_profiles(filename)
 
-                if not isinstance(profiles, OnboardProfiles):
-                    raise ValueError(_("Invalid profiles file format"))
+            if not isinstance(profiles, OnboardProfiles):
+                raise ValueError(_("Invalid profiles file format"))
 
-                if getattr(profiles, "version", None) != OnboardProfilesVersion:
-                    version = getattr(profiles, "version", None)
-                    raise ValueError(_("Profile version mismatch. Expected %d, got %s") % (OnboardProfilesVersion, version))
+            if getattr(profiles, "version", None) != OnboardProfilesVersion:
+                version = getattr(profiles, "version", None)
+                raise ValueError(_("Profile version mismatch. Expected %d, got %s") % (OnboardProfilesVersion, version))
 
-                # Optional: Warn if device name differs but allow import
-                if getattr(profiles, "name", None) != device.name:
-                    name = getattr(profiles, "name", None)
-                    logger.warning("Profile device name '%s' differs from current device '%s'", name, device.name)
+            # Optional: Warn if device name differs but allow import
+            if getattr(profiles, "name", None) != device.name:
+                name = getattr(profiles, "name", None)
+                logger.warning("Profile device name '%s' differs from current device '%s'", name, device.name)
 
-                # Write to device
-                written = profiles.write(device)
+            return profiles
 
+        def _do_write(profiles):
+            try:
+                written = profiles.write(device)
                 GLib.idle_add(
                     _show_message,
                     window,
@@ -248,14 +374,19 @@ def import_profiles(window, device):
                     _("Successfully imported profiles.\nWrote %d sectors to %s.") % (written, device.name),
                     Gtk.MessageType.INFO,
                 )
+            except Exception as e:
+                _import_failed(e)
 
+        def _import_done(future):
+            try:
+                profiles = future.result()
             except Exception as e:
-                logger.error("Error importing profiles: %s", traceback.format_exc())
-                GLib.idle_add(
-                    _show_message, window, _("Import Failed"), _("Failed to import profiles:\n%s") % str(e), Gtk.MessageType.ERROR
-                )
+                _import_failed(e)
+                return
+            # device I/O stays on the AsyncUI task runner along with all other device requests
+            common.ui_async(_do_write, profiles)
 
-        common.ui_async(_do_import)
+        _profiles_io.submit(_do_import).add_done_callback(_import_done)
 
 
 def edit_profiles(window, device):
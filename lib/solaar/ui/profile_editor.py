@@ -18,6 +18,7 @@
 import logging
 import traceback
 
+from gi.repository import GLib
 from gi.repository import Gtk
 
 from solaar.i18n import _
@@ -33,13 +34,19 @@ def create(device, parent_window):
     return editor
 
 
+def _profile_label(profile):
+    """Text shown for a profile in the profile list"""
+    return f"{profile.name} ✓" if profile.enabled else profile.name
+
+
 class ProfileEditorDialog:
     def __init__(self, device, parent_window):
         self.device = device
         self.profiles = device.profiles
         self.current_profile_num = None
         self.modified = False
-        self._ignore_changes = 0
+        self._field_handlers = []  # (widget, handler id) of the edit field change handlers
+        self._row_refs = {}  # profile number -> profile_store row reference
 
         # Create dialog
         self.dialog = Gtk.Dialog(
@@ -91,22 +98,14 @@ class ProfileEditorDialog:
         sw.set_size_request(200, 0)
         parent.pack_start(sw, False, True, 0)
 
-        # TreeView model: [profile_number, profile_name, enabled_str]
-        self.profile_store = Gtk.ListStore(int, str, str)
+        # TreeView model: [profile_number, profile name + enabled indicator]
+        self.profile_store = Gtk.ListStore(int, str)
         self.profile_view = Gtk.TreeView(model=self.profile_store)
         self.profile_view.set_headers_visible(False)
 
         # Column: Profile name + enabled indicator
         renderer = Gtk.CellRendererText()
-        column = Gtk.TreeViewColumn("Profile", renderer)
-
-        def format_profile(column, cell, model, iter, data):
-            profile_num = model.get_value(iter, 0)
-            profile_name = model.get_value(iter, 1)
-            enabled_str = model.get_value(iter, 2)
-            cell.set_property("text", f"{profile_name} {enabled_str}")
-
-        column.set_cell_data_func(renderer, format_profile)
+        column = Gtk.TreeViewColumn("Profile", renderer, text=1)
         self.profile_view.append_column(column)
 
         # Selection signal
@@ -139,7 +138,7 @@ class ProfileEditorDialog:
         self.name_entry = Gtk.Entry()
         self.name_entry.set_max_length(24)
         self.name_entry.set_hexpand(True)
-        self.name_entry.connect("changed", self._on_field_changed)
+        self._connect_field(self.name_entry, "changed")
         grid.attach(self.name_entry, 1, row, 2, 1)
 
         row += 1
@@ -149,7 +148,7 @@ class ProfileEditorDialog:
         grid.attach(label, 0, row, 1, 1)
 
         self.enabled_switch = Gtk.Switch(halign=Gtk.Align.START)
-        self.enabled_switch.connect("notify::active", self._on_field_changed)
+        self._connect_field(self.enabled_switch, "notify::active")
         grid.attach(self.enabled_switch, 1, row, 1, 1)
 
         row += 1
@@ -193,7 +192,7 @@ class ProfileEditorDialog:
             # DPI spinner
             spinner = Gtk.SpinButton.new_with_range(100, 25600, 50)
             spinner.set_hexpand(True)
-            spinner.connect("value-changed", self._on_field_changed)
+            self._connect_field(spinner, "value-changed")
             self.dpi_spinners.append(spinner)
             grid.attach(spinner, 1, row, 1, 1)
 
@@ -202,7 +201,7 @@ class ProfileEditorDialog:
                 default_radio = Gtk.RadioButton()
             else:
                 default_radio = Gtk.RadioButton.new_from_widget(self.default_radios[0])
-            default_radio.connect("toggled", self._on_field_changed)
+            self._connect_field(default_radio, "toggled")
             default_radio.set_halign(Gtk.Align.CENTER)
             self.default_radios.append(default_radio)
             grid.attach(default_radio, 2, row, 1, 1)
@@ -212,22 +211,33 @@ class ProfileEditorDialog:
                 shift_radio = Gtk.RadioButton()
             else:
                 shift_radio = Gtk.RadioButton.new_from_widget(self.shift_radios[0])
-            shift_radio.connect("toggled", self._on_field_changed)
+            self._connect_field(shift_radio, "toggled")
             shift_radio.set_halign(Gtk.Align.CENTER)
             self.shift_radios.append(shift_radio)
             grid.attach(shift_radio, 3, row, 1, 1)
 
             row += 1
 
+    def _connect_field(self, widget, signal):
+        """Connect a field change signal to _on_field_changed so that it can be blocked while loading a profile"""
+        self._field_handlers.append((widget, widget.connect(signal, self._on_field_changed)))
+
     def _populate_profile_list(self):
         """Populate the profile list from device.profiles"""
+        # Detach the model so that the view is not updated for every row
+        self.profile_view.set_model(None)
         self.profile_store.clear()
+        self._row_refs = {}
 
         if self.profiles and self.profiles.profiles:
             for profile_num, profile in sorted(self.profiles.profiles.items()):
-                enabled_str = "✓" if profile.enabled else ""
-                self.profile_store.append([profile_num, profile.name, enabled_str])
+                tree_iter = self.profile_store.insert_with_valuesv(-1, [0, 1], [profile_num, _profile_label(profile)])
+                path = self.profile_store.get_path(tree_iter)
+                self._row_refs[profile_num] = Gtk.TreeRowReference.new(self.profile_store, path)
 
+        self.profile_view.set_model(self.profile_store)
+
+        if self._row_refs:
             # Select first profile by default
             self.profile_view.get_selection().select_path(0)
 
@@ -241,39 +251,57 @@ class ProfileEditorDialog:
         self.current_profile_num = profile_num
         profile = self.profiles.profiles[profile_num]
 
-        # Disable change tracking while populating fields
-        self._ignore_changes += 1
+        # Disable change tracking and coalesce property notifications while populating fields
+        for widget, handler_id in self._field_handlers:
+            widget.freeze_notify()
+            widget.handler_block(handler_id)
 
         try:
             # Set profile name
-            self.name_entry.set_text(profile.name or "")
+            name = profile.name or ""
+            if self.name_entry.get_text() != name:
+                self.name_entry.set_text(name)
 
             # Set enabled switch
-            self.enabled_switch.set_active(bool(profile.enabled))
+            enabled = bool(profile.enabled)
+            if self.enabled_switch.get_active() != enabled:
+                self.enabled_switch.set_active(enabled)
 
             # Set DPI values
-            for i in range(5):
-                if i < len(profile.resolutions):
-                    self.dpi_spinners[i].set_value(profile.resolutions[i])
-                else:
-                    self.dpi_spinners[i].set_value(800)
+            for i, spinner in enumerate(self.dpi_spinners):
+                dpi = profile.resolutions[i] if i < len(profile.resolutions) else 800
+                if spinner.get_value_as_int() != dpi:
+                    spinner.set_value(dpi)
 
             # Set default DPI radio
             if 0 <= profile.resolution_default_index < 5:
-                self.default_radios[profile.resolution_default_index].set_active(True)
+                radio = self.default_radios[profile.resolution_default_index]
+                if not radio.get_active():
+                    radio.set_active(True)
 
             # Set shift DPI radio
             if 0 <= profile.resolution_shift_index < 5:
-                self.shift_radios[profile.resolution_shift_index].set_active(True)
+                radio = self.shift_radios[profile.resolution_shift_index]
+                if not radio.get_active():
+                    radio.set_active(True)
 
         finally:
-            self._ignore_changes -= 1
+            # thaw before unblocking so that the queued notifications are not seen as edits
+            for widget, handler_id in self._field_handlers:
+                widget.thaw_notify()
+                widget.handler_unblock(handler_id)
 
     def _on_field_changed(self, *args):
         """Mark as modified when any field changes"""
-        if self._ignore_changes == 0:
-            self.modified = True
-            self.save_button.set_sensitive(True)
+        if self.modified:
+            return
+        self.modified = True
+        GLib.idle_add(self._on_modified)
+
+    def _on_modified(self):
+        """Enable saving once the first change has been made"""
+        self.save_button.set_sensitive(True)
+        return False
 
     def _collect_profile_data(self):
         """Collect current values from edit fields"""
@@ -305,43 +333,37 @@ class ProfileEditorDialog:
                 break
 
         # Update profile list display
-        for row in self.profile_store:
-            if row[0] == self.current_profile_num:
-                enabled_str = "✓" if profile.enabled else ""
-                row[1] = profile.name
-                row[2] = enabled_str
-                break
+        row_ref = self._row_refs.get(self.current_profile_num)
+        if row_ref is not None and row_ref.valid():
+            tree_iter = self.profile_store.get_iter(row_ref.get_path())
+            self.profile_store.set_value(tree_iter, 1, _profile_label(profile))
 
     def _on_save(self, *args):
         """Write profiles to device"""
         # Collect current field values
         self._collect_profile_data()
 
-        # Write to device in async operation
+        def _finish(written, error):
+            if error is None:
+                self._show_message(
+                    _("Success"),
+                    _("Successfully updated profiles on %s.\nWrote %d sectors.") % (self.device.name, written),
+                    Gtk.MessageType.INFO,
+                )
+                self.dialog.destroy()
+            else:
+                self._show_message(_("Error"), _("Failed to write profiles to device:\n%s") % error, Gtk.MessageType.ERROR)
+            return False
+
+        # Write to device in async operation, then report the result on the main thread
         def _do_save():
             try:
                 written = self.profiles.write(self.device)
                 logger.info(f"Successfully wrote {written} sectors to device {self.device.name}")
-
-                # Show success dialog on main thread
-                common.ui_async(
-                    lambda: self._show_message(
-                        _("Success"),
-                        _("Successfully updated profiles on %s.\nWrote %d sectors.") % (self.device.name, written),
-                        Gtk.MessageType.INFO,
-                    )
-                )
-
-                # Close dialog
-                common.ui_async(lambda: self.dialog.destroy())
-
+                GLib.idle_add(_finish, written, None)
             except Exception as e:
                 logger.error("Error writing profiles: %s", traceback.format_exc())
-                common.ui_async(
-                    lambda: self._show_message(
-                        _("Error"), _("Failed to write profiles to device:\n%s") % str(e), Gtk.MessageType.ERROR
-                    )
-                )
+                GLib.idle_add(_finish, 0, str(e))
 
         common.ui_async(_do_save)
 
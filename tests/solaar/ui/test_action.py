@@ -0,0 +1,149 @@
+import io
+import mmap
+import os
+
+from unittest import mock
+
+import pytest
+import yaml
+
+from logitech_receiver.hidpp20 import Button
+from logitech_receiver.hidpp20 import OnboardProfile
+from logitech_receiver.hidpp20 import OnboardProfiles
+from solaar.ui import action
+
+PROFILES_YAML = """!OnboardProfiles
+buttons: 2
+count: 2
+gbuttons: 1
+name: Test Mouse
+profiles:
+  1: !OnboardProfile
+    buttons:
+    - !Button {behavior: 8, type: 1, value: !NamedInt {name: Mouse Button Left, value: 1}}
+    - !Button {behavior: 9, data: 0, value: 5}
+    enabled: 1
+    gbuttons:
+    - !Button {behavior: 15, bytes: !!binary "/////w=="}
+    lighting:
+    - !LEDEffectSetting {ID: !NamedInt {name: Static, value: 1}, color: 16711680, ramp: 0}
+    - !LEDEffectSetting {ID: 0}
+    name: First
+    resolutions: [400, 800, 1600, 3200, 6400]
+  2: !OnboardProfile
+    buttons: []
+    enabled: 0
+    gbuttons: []
+    lighting: []
+    name: ''
+    resolutions: [800]
+sectors: 2
+size: 255
+version: 3
+"""
+
+
+def test_profiles_round_trip():
+    profiles = yaml.load(PROFILES_YAML, Loader=action._Loader)
+
+    assert isinstance(profiles, OnboardProfiles)
+    assert isinstance(profiles.profiles[1], OnboardProfile)
+    assert isinstance(profiles.profiles[1].buttons[0], Button)
+    dumped = yaml.dump(profiles, Dumper=action._Dumper)
+    assert "!NamedInt" not in dumped  # written as plain ints, like the rest of Solaar does
+    assert "{behavior: 8, type: 1, value: 1}" in dumped
+    assert "{ID: 1, color: 16711680, ramp: 0}" in dumped
+    assert yaml.dump(yaml.load(dumped, Loader=action._Loader), Dumper=action._Dumper) == dumped
+
+
+def test_profiles_tags_stay_private():
+    assert OnboardProfiles in action._Dumper.yaml_representers
+    assert OnboardProfiles not in action._Dumper.__base__.yaml_representers
+    assert "!OnboardProfiles" in action._Loader.yaml_constructors
+
+
+def test_profiles_events():
+    profiles = yaml.load(PROFILES_YAML, Loader=action._Loader)
+    stream = io.StringIO()
+    dumper = action._Dumper(stream)
+    try:
+        for event in action._profiles_events(dumper, profiles):
+            dumper.emit(event)
+    finally:
+        dumper.dispose()
+
+    assert stream.getvalue() == yaml.dump(profiles, Dumper=action._Dumper)
+
+
+@pytest.mark.parametrize("padding, mapped", [(0, False), (action._MMAP_MIN_SIZE, True)])
+def test_read_profiles(tmp_path, padding, mapped):
+    filename = tmp_path / "profiles.yaml"
+    filename.write_text(PROFILES_YAML + "#" * padding + "\n")
+
+    with mock.patch("solaar.ui.action.mmap.mmap", wraps=mmap.mmap) as mmap_mock:
+        profiles = action._read_profiles(str(filename))
+
+    assert mmap_mock.called == mapped
+    assert isinstance(profiles, OnboardProfiles)
+    assert yaml.dump(profiles, Dumper=action._Dumper) == yaml.dump(
+        yaml.load(PROFILES_YAML, Loader=action._Loader), Dumper=action._Dumper
+    )
+
+
+def test_write_profiles(tmp_path):
+    profiles = yaml.load(PROFILES_YAML, Loader=action._Loader)
+    filename = str(tmp_path / "profiles.yaml")
+
+    action._write_profiles(profiles, filename)
+
+    with open(filename) as f:
+        assert f.read() == yaml.dump(profiles, Dumper=action._Dumper)
+    assert yaml.dump(action._read_profiles(filename), Dumper=action._Dumper) == yaml.dump(profiles, Dumper=action._Dumper)
+
+
+def test_write_profiles_streams(tmp_path):
+    profiles = yaml.load(PROFILES_YAML, Loader=action._Loader)
+    profile = yaml.dump(profiles.profiles[1], Dumper=action._Dumper)
+    profiles.profiles = {i: yaml.load(profile, Loader=action._Loader) for i in range(1, 201)}
+    filename = str(tmp_path / "profiles.yaml")
+    sizes = []
+
+    def represent(dumper, data):
+        if isinstance(data, OnboardProfile):
+            sizes.append(os.path.getsize(filename + ".part"))
+        return represent_data(dumper, data)
+
+    represent_data = action._represent
+    with mock.patch("solaar.ui.action._represent", represent):
+        action._write_profiles(profiles, filename)
+
+    assert len(sizes) == 200
+    assert 0 < sizes[-1] < os.path.getsize(filename)  # earlier profiles were in the file before the last one was represented
+    with open(filename) as f:
+        assert f.read() == yaml.dump(profiles, Dumper=action._Dumper)
+
+
+def test_write_profiles_failure_keeps_file(tmp_path):
+    profiles = yaml.load(PROFILES_YAML, Loader=action._Loader)
+    profiles.profiles[2].unknown = object()  # not representable, so the dump fails partway
+    filename = tmp_path / "profiles.yaml"
+    filename.write_text("previous export\n")
+
+    with pytest.raises(yaml.representer.RepresenterError):
+        action._write_profiles(profiles, str(filename))
+
+    assert filename.read_text() == "previous export\n"
+    assert os.listdir(tmp_path) == ["profiles.yaml"]
+
+
+def test_write_profiles_shared_object(tmp_path):
+    profiles = yaml.load(PROFILES_YAML, Loader=action._Loader)
+    button = profiles.profiles[1].buttons[0]
+    profiles.profiles[1].buttons[1] = button  # the same object twice within one profile
+    filename = str(tmp_path / "profiles.yaml")
+
+    action._write_profiles(profiles, filename)
+
+    loaded = action._read_profiles(filename).profiles[1].buttons
+    assert loaded[0] is not loaded[1]  # written out in full both times, without an alias
+    assert loaded[0].__dict__ == loaded[1].__dict__ == button.__dict__